@@ -3,12 +3,16 @@ Script to draw Bingo numbers to play the game
 '''
 
 import argparse
-from collections import namedtuple
 from random import shuffle
 
-# Define object to hold call (drawn) value column label and bingo card
-# space value.
-DrawValue_t = namedtuple('DrawValue_t', ['label', 'value'])
+# Values for a standard bingo card. The keys are the column labels and
+# the value of each key is a tuple of the values for that column.
+STANDARD_VALUES = {
+    'B': tuple(map(str, range(1, 16))),
+    'I': tuple(map(str, range(16, 31))),
+    'N': tuple(map(str, range(31, 46))),
+    'G': tuple(map(str, range(46, 61))),
+    'O': tuple(map(str, range(61, 76)))}
 
 
 def main():
@@ -48,13 +52,10 @@ def main():
 
     # Assign values to draw from
     if args.value_file is None:
-        # Drawn values are for a standard bingo card
-        drawValuesDict = {
-            'B': [str(x) for x in range(1, 16)],
-            'I': [str(x) for x in range(16, 31)],
-            'N': [str(x) for x in range(31, 46)],
-            'G': [str(x) for x in range(46, 61)],
-            'O': [str(x) for x in range(61, 76)]}
+        # Drawn values are for a standard bingo card. Copy the dict
+        # since columns may be deleted from it below. The value tuples
+        # are shared.
+        drawValuesDict = dict(STANDARD_VALUES)
         if args.card_size == '3x3':
             # Delete the 'G' and 'O' columns
             del drawValuesDict['G'], drawValuesDict['O']
@@ -63,63 +64,65 @@ def main():
             del drawValuesDict['O']
     else:
         # Drawn values are read from a file
-        with open(args.value_file) as fin:
-            drawLinesList = fin.readlines()
+        with open(args.value_file, encoding='utf-8') as fin:
+            # Split only on newlines, as readlines() does. splitlines()
+            # would also split on characters such as form feeds.
+            drawLinesList = fin.read().split('\n')
+        if not drawLinesList[-1]:
+            # Remove the empty string after the final newline
+            del drawLinesList[-1]
         if not drawLinesList:
             errMsg = f'No values were found in {args.value_file}'
             raise ValueError(errMsg)
         # Test to see if columns are included in the file data
-        useLabels = False
-        if len(drawLinesList[0].split('::')) > 1:
-            useLabels = True
+        useLabels = '::' in drawLinesList[0]
         if useLabels:
             # Reading labels from each line of file data
             drawValuesDict = {}
-            for line in drawLinesList:
-                lineSp = line.split('::')
-                label = lineSp[0]
-                value = lineSp[1].rstrip().replace('\\n', '\n')
-                if label not in drawValuesDict:
-                    drawValuesDict[label] = [value]
-                else:
-                    drawValuesDict[label].append(value)
+            for iLine,line in enumerate(drawLinesList, 1):
+                label, sep, value = line.partition('::')
+                if not sep:
+                    if not line.strip():
+                        # Skip blank lines
+                        continue
+                    errMsg = 'No column label was found on line ' \
+                        + f'{iLine} of {args.value_file}'
+                    raise ValueError(errMsg)
+                drawValuesDict.setdefault(label, []).append(
+                    value.rstrip().replace('\\n', '\n'))
         else:
             # Not using labels
-            drawValuesDict = {None: []}
-            for line in drawLinesList:
-                drawValuesDict[None].append(
-                    line.rstrip().replace('\\n', '\n'))
-        
-    # Put all values into a single list
+            drawValuesDict = {None: [line.rstrip().replace('\\n', '\n')
+                for line in drawLinesList]}
+
+    # Put all values into a single list. Each drawn value is a tuple of
+    # (column label, bingo card space value).
     drawValuesList = []
     if None in drawValuesDict:
         # All values are already in a single list and not using column
         # labels.
         for v in drawValuesDict[None]:
-            drawValuesList.append(DrawValue_t('', v))
+            drawValuesList.append(('', v))
     else:
         for label in drawValuesDict:
             for v in drawValuesDict[label]:
-                drawValuesList.append(DrawValue_t(label, v))
+                drawValuesList.append((label, v))
         
     # Shuffle the values to draw
     shuffle(drawValuesList)
 
-    # Loop to play game (draw values)
-    drawCount = 0
-    drawAgain = True
+    # Loop to play game (draw values). The shuffled values are drawn in
+    # order.
     print('Enter Q or q to quit.')
-    while drawValuesList and drawAgain:
-        drawCount += 1
-        v = drawValuesList.pop()
+    for drawCount,v in enumerate(drawValuesList, 1):
         if sayColumns:
-            print(f'{drawCount}) {v.label} {v.value}')
+            print(f'{drawCount}) {v[0]} {v[1]}')
         else:
-            print(f'{drawCount}) {v.value}')
+            print(f'{drawCount}) {v[1]}')
         userInput = input('')
         if userInput.lower() == 'q':
-            drawAgain = False
-    if (not drawValuesList) and drawAgain:
+            break
+    else:
         # All the values have been drawn, but another draw is requested
         print('All the values have been drawn.')
     # end of function main
@@ -3,19 +3,16 @@ Script to make Bingo cards
 '''
 
 import argparse
-from collections import OrderedDict
-from math import ceil, floor
-from random import randint, shuffle
-from copy import deepcopy
-
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_pdf import PdfPages
-from matplotlib.tight_layout import get_renderer
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from math import ceil
+from random import Random, SystemRandom
 
 # Constants
 # Default values
 #   card size = number of card rows x columns
 #   card title = card title string
+#   jobs = number of processes used to make the pages of cards
 #   multiLineFontSize = font size of text that occupies multiple lines
 #     of a card space
 #   out file = output file name containing generated bingo cards
@@ -24,16 +21,28 @@ DEFAULTS = {
     'card size': '5x5',
     'cards per page': 4,
     'column labels': 'B,I,N,G,O',
+    'jobs': 1,
     'multiLineFontSize': 12,
     'out file': 'bingo_cards.pdf'}
 
+# Space values for a standard bingo card. The keys are the column
+# labels and the value of each key is a tuple of the values for that
+# column.
+STANDARD_VALUES = {
+    'B': tuple(map(str, range(1, 16))),
+    'I': tuple(map(str, range(16, 31))),
+    'N': tuple(map(str, range(31, 46))),
+    'G': tuple(map(str, range(46, 61))),
+    'O': tuple(map(str, range(61, 76)))}
+
 
 def make_cards(valuesDict, nCards, cardSize=DEFAULTS['card size'],
         cardTitle=None,
         columnLabelList=DEFAULTS['column labels'].split(','),
         multiLineFontSize=DEFAULTS['multiLineFontSize'],
         nCardsPerPage=DEFAULTS['cards per page'],
-        outFile=DEFAULTS['out file'], scatter=False, useFreeSpace=True):
+        outFile=DEFAULTS['out file'], scatter=False, useFreeSpace=True,
+        nJobs=DEFAULTS['jobs']):
     '''
     Creates bingo cards and writes them to a PDF file.
     INPUT
@@ -60,19 +69,71 @@ def make_cards(valuesDict, nCards, cardSize=DEFAULTS['card size'],
     - useFreeSpace = True / False, True will put a free space at the
         center of each card. If the number of rows is 4, the free space
         will be randomly selected.    
+    - nJobs = number of processes used to make the pages of cards. If
+        more than 1, the pages made by each process are combined into
+        outFile using pypdf.
+    '''
+    # Determine the number of pages that are needed to make the number
+    # of cards requested.
+    nPages = ceil(nCards / nCardsPerPage)
+
+    # Arguments for make_pages that are the same for every page
+    pageArgs = (valuesDict, cardSize, cardTitle, columnLabelList,
+        multiLineFontSize, nCardsPerPage, scatter, useFreeSpace)
+
+    nJobs = min(nJobs, nPages)
+    if nJobs <= 1:
+        # Make all pages in this process
+        make_pages(outFile, nPages, *pageArgs)
+        return
+
+    from pypdf import PdfWriter
+
+    # Split the pages as evenly as possible between the processes. Each
+    # process gets its own random seed so that no two processes make
+    # the same cards.
+    nPagesList = [nPages // nJobs + (1 if i < nPages % nJobs else 0)
+        for i in range(nJobs)]
+    sysRandom = SystemRandom()
+    with ProcessPoolExecutor(max_workers=nJobs) as executor:
+        futureList = [executor.submit(make_pages_pdf,
+                sysRandom.randrange(2**32), n, *pageArgs)
+            for n in nPagesList]
+        # Combine the pages from each process in a single PDF file
+        writer = PdfWriter()
+        for future in futureList:
+            writer.append(BytesIO(future.result()))
+    writer.write(outFile)
+    # end of function make_cards
+
+
+def make_pages(pdfFile, nPages, valuesDict, cardSize, cardTitle,
+        columnLabelList, multiLineFontSize, nCardsPerPage, scatter,
+        useFreeSpace, randomSeed=None):
+    '''
+    Creates pages of bingo cards and writes them to a PDF file.
+    INPUT
+    - pdfFile = name of output PDF file or a binary file object that the
+        PDF is written to
+    - nPages = number of pages of cards to generate
+    - randomSeed = seed for the random values on the cards. If None, the
+        seed is taken from the operating system.
+    - The remaining inputs are described in make_cards.
     '''
+    # Matplotlib is slow to import, so it is only imported once cards
+    # are actually being made
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.backends.backend_pdf import PdfPages
+    from matplotlib.figure import Figure
+
     # Map the number of cards per page to the number of axes rows and
-    # columns that can be used in the call to plt.subplots(). The
+    # columns that can be used in the call to fig.subplots(). The
     # values are a tuple as (nRows, nCols).
     pageLayoutDict = {
         1: (1, 1),
         2: (2, 1),
         4: (2, 2)}
 
-    # Determine the number of pages that are needed to make the number
-    # of cards requested.
-    nPages = ceil(nCards / nCardsPerPage)
-
     # Get the number of rows and columns in each card
     nRows = int(cardSize[0])
     nCols = int(cardSize[-1])
@@ -82,95 +143,114 @@ def make_cards(valuesDict, nCards, cardSize=DEFAULTS['card size'],
     if scatter:
         # If values are scattered over entire card, the values to use
         # will be in a single list with their dict key being None.
-        colIter = (None,) * nCols
+        colKeys = (None,) * nCols
+        shuffleKeys = (None,)
     else:
         # Iterate over each column
-        colIter = valuesDict.keys()
+        colKeys = tuple(valuesDict.keys())
+        shuffleKeys = colKeys
+
+    # Cache the card values as tuples. They are never modified, so each
+    # card samples from these tuples instead of copying the values.
+    colValues = {k: tuple(v) for k,v in valuesDict.items()}
+    if scatter and None not in colValues:
+        # Card values are in separate columns. Put them into a single
+        # tuple. The None key contains all values in a single tuple.
+        colValues[None] = tuple(
+            v for k in valuesDict for v in valuesDict[k])
+    # Random number generator used only for these pages. Its methods
+    # are bound to local names since they are called for every card.
+    rng = Random(randomSeed)
+    drawSample = rng.sample
+    drawInt = rng.randint
+    # Number of values drawn for each key when making a card. If values
+    # are scattered, every space is drawn from the None key.
+    nDraw = nRows * nCols if scatter else nRows
+
+    # Make the column label row that is printed at the top of every
+    # card
+    useColumnLabels = columnLabelList is not None
+    headerRow = tuple(columnLabelList[:nCols]) if useColumnLabels else ()
+    if useColumnLabels and len(headerRow) < nCols:
+        errMsg = f'{len(headerRow)} column labels were given for cards ' \
+            + f'with {nCols} columns'
+        raise ValueError(errMsg)
+    # Rows of each card that are populated with card values
+    nRowsPrinted = nRows + 1 if useColumnLabels else nRows
+    iRowFirst = 1 if useColumnLabels else 0
+
+    # Location of the free space. For an odd number of rows (columns),
+    # the free space is in the middle row (column) of every card. For an
+    # even number, it is randomly selected for each card.
+    oddRows = (nRows % 2) != 0
+    oddCols = (nCols % 2) != 0
+    iRowFreeMid = iRowFirst + nRows // 2
+    iColFreeMid = nCols // 2
+
+    # Create the figure once and reuse it for every page. The axes are
+    # cleared before each card is drawn on them. The figure is not
+    # managed by pyplot. It is given an Agg canvas so the renderer used
+    # to size the card text is the same one pyplot would provide.
+    (nAxRows, nAxCols) = pageLayoutDict[nCardsPerPage]
+    fig = Figure(figsize=(8.5, 11))
+    FigureCanvasAgg(fig)
+    axArr = fig.subplots(nAxRows, nAxCols, squeeze=False)
+    rend = fig.canvas.get_renderer()
+    # The table row heights depend on the size of the axes when the table
+    # is made, so the cards on every page are drawn with the default
+    # subplot parameters. The page layout is computed from the first page
+    # and the same layout is applied to every page before it is saved.
+    subplotParamNames = ('left', 'bottom', 'right', 'top', 'wspace',
+        'hspace')
+    defaultSubplotParams = {k: getattr(fig.subplotpars, k)
+        for k in subplotParamNames}
+    pageSubplotParams = None
 
     #pdb.set_trace()
-    with PdfPages(outFile) as pdf:
+    with PdfPages(pdfFile) as pdf:
         # Loop for each page
         for p in range(nPages):
-            # Create figure for this page
-            (nAxRows, nAxCols) = pageLayoutDict[nCardsPerPage]
-            fig, axArr = plt.subplots(nAxRows, nAxCols, squeeze=False)
-            fig.set_size_inches(8.5, 11)
-            rend = get_renderer(fig)
+            fig.subplots_adjust(**defaultSubplotParams)
             # Loop for each card on the current page
             for ax in axArr.flat:
+                # Remove the card drawn on these axes for the previous
+                # page
+                ax.clear()
+                ax.set_axis_off()
                 # Create values for current card
-                useColumnLabels = False
-                if columnLabelList is not None:
-                    useColumnLabels = True
-                # Shuffle the card values
-                shuffleDict = deepcopy(valuesDict)
-                if scatter:
-                    # Shuffle all values from all columns together
-                    if None in shuffleDict:
-                        # All card values are already in a single list
-                        shuffle(shuffleDict[None])
-                    else:
-                        # Card values are in separate columns. Put them
-                        # into a single list. The None key contains all
-                        # values in a single list.
-                        shuffleDict[None] = []
-                        for k in valuesDict:
-                            shuffleDict[None].extend(valuesDict[k])
-                        shuffle(shuffleDict[None])
-                else:
-                    # Shuffle values within their columns. valuesDict
-                    # must contain column information.
-                    for k in valuesDict:
-                        shuffle(shuffleDict[k])
+                # Randomly draw the card values. If values are
+                # scattered, all values from all columns are drawn
+                # together from the None key. Otherwise, values are
+                # drawn within their columns.
+                shuffleDict = {}
+                for k in shuffleKeys:
+                    shuffleDict[k] = iter(drawSample(colValues[k], nDraw))
+                # Build the card text row by row (looks how the card is
+                # actually printed). The table function needs the
+                # values of all columns for each row.
+                cardTextList = [[None] * nCols for _ in range(nRowsPrinted)]
+                if useColumnLabels:
+                    cardTextList[0] = list(headerRow)
                 # Loop to populate each card column
-                cardTextDict = OrderedDict()
-                for iCol,colName in enumerate(colIter):
-                    if useColumnLabels:
-                        cardTextDict[iCol] = [columnLabelList[iCol]]
-                    else:
-                        cardTextDict[iCol] = []
-                    # Make iterator for rows. Use the current column
-                    # nRows times.
-                    rowIter = (colName,) * nRows
+                for iCol,colName in enumerate(colKeys):
+                    colDraws = shuffleDict[colName]
                     # Loop for each row of current column
-                    for row in rowIter:
-                        cardTextDict[iCol].append(shuffleDict[row].pop())
-                # Now need to "transpose" cardTextDict. The values of
-                # each key (card column) of cardTextDict are all the
-                # values for that column. The table function needs the
-                # values of all columns for each row.
-                cardTextList = []
-                # Loop for each row of list (looks how the card is
-                # actually printed)
-                nRowsPrinted = nRows + 1 if useColumnLabels else nRows
-                for iRow in range(nRowsPrinted):
-                    # Get the "iRowth" value of each key (column) of
-                    # cardTextDict. 
-                    cardTextList.append(
-                        [cardTextDict[k][iRow] for k in cardTextDict])
+                    for iRow in range(iRowFirst, nRowsPrinted):
+                        cardTextList[iRow][iCol] = next(colDraws)
                 # Card contents have been determined. Check if we are
                 # assigning a free space
                 if useFreeSpace:
-                    if (nRows % 2) != 0:
-                        # Odd number of rows, assign middle row
-                        iRowFree = floor(nRows / 2)
-                    else:
-                        # Even number of rows, randomly assign free space
-                        iRowFree = randint(0, nRows-1)
-                    if useColumnLabels:
-                        iRowFree += 1
-                    if (nCols % 2) != 0:
-                        # Odd number of columns, assign middle column
-                        iColFree = floor(nCols / 2)
+                    if oddRows and oddCols:
+                        iRowFree, iColFree = iRowFreeMid, iColFreeMid
                     else:
-                        # Even number of columns, randomly assign free
-                        # space
-                        iColFree = randint(0, nCols-1)
+                        iRowFree = iRowFreeMid if oddRows \
+                            else drawInt(iRowFirst, nRowsPrinted-1)
+                        iColFree = iColFreeMid if oddCols \
+                            else drawInt(0, nCols-1)
                     cardTextList[iRowFree][iColFree] = '\u2606' # star
                 # Create the table on the page and format it
                 table = ax.table(cellText=cardTextList,
                     cellLoc='center', loc='upper right')
-                ax.set_axis_off()
                 if cardTitle is not None:
                     ax.set_title(cardTitle, fontsize=20)
                 if nCardsPerPage == 1:
@@ -190,21 +270,63 @@ def make_cards(valuesDict, nCards, cardSize=DEFAULTS['card size'],
                 # as large as possible without going out of the cell
                 # boundaries. For multiline card space values, don't
                 # auto set the font size, but assign a smaller font
-                # size.
-                for cell in table.get_celld().values():
-                    if '\n' in cell.get_text().get_text():
-                        cell.set_fontsize(multiLineFontSize)
-                    else:
-                        cell.PAD = 0.0005
-                        cell.auto_set_font_size(rend)
-            
+                # size. The cell text is taken from cardTextList rather
+                # than read back from each cell.
+                celld = table.get_celld()
+                for iRow,rowText in enumerate(cardTextList):
+                    for iCol,text in enumerate(rowText):
+                        cell = celld[iRow,iCol]
+                        if '\n' in text:
+                            cell.set_fontsize(multiLineFontSize)
+                        else:
+                            cell.PAD = 0.0005
+                            cell.auto_set_font_size(rend)
+
             # All cards on the current page have been made. Adjust card
-            # spacing on page.
-            fig.set_tight_layout({'rect': (0.05, 0, 0.95, 0.95)})
-            plt.subplots_adjust(wspace=0.05, hspace=0.1)
-            pdf.savefig()
-            plt.close()
-        # end of function make_cards
+            # spacing on page. Every page has the same card layout, so
+            # the spacing is only computed for the first page and reused
+            # for the rest.
+            if pageSubplotParams is None:
+                fig.subplots_adjust(wspace=0.05, hspace=0.1)
+                fig.tight_layout(rect=(0.05, 0, 0.95, 0.95))
+                pageSubplotParams = {k: getattr(fig.subplotpars, k)
+                    for k in subplotParamNames}
+            else:
+                fig.subplots_adjust(**pageSubplotParams)
+            pdf.savefig(fig)
+    # end of function make_pages
+
+
+def make_pages_pdf(randomSeed, nPages, *pageArgs):
+    '''
+    Creates pages of bingo cards in a separate process.
+    INPUT
+    - randomSeed = seed for the random values on the cards
+    - nPages = number of pages of cards to generate
+    - pageArgs = remaining inputs to make_pages after nPages
+    OUTPUT
+    - bytes of the PDF file containing the pages
+    '''
+    pdfBuffer = BytesIO()
+    make_pages(pdfBuffer, nPages, *pageArgs, randomSeed=randomSeed)
+    return pdfBuffer.getvalue()
+    # end of function make_pages_pdf
+
+
+def positive_int(value):
+    '''
+    Converts a command-line argument to an integer that is at least 1.
+    Used as an argparse type.
+    '''
+    try:
+        intValue = int(value)
+    except ValueError:
+        intValue = 0
+    if intValue < 1:
+        errMsg = f'invalid positive integer value: {value!r}'
+        raise argparse.ArgumentTypeError(errMsg)
+    return intValue
+    # end of function positive_int
 
 
 def main():
@@ -227,6 +349,9 @@ def main():
             + 'commas are used as the card column labels. The default ' \
             + f'value is: {DEFAULTS["column labels"]}',
         'columnLabelsOff': 'Option to not print column labels on card',
+        'jobs': 'Number of processes used to make the pages of cards. ' \
+            + 'Using more than 1 process requires the optional pypdf ' \
+            + f'package. The default value is {DEFAULTS["jobs"]}.',
         'multiLineFontSize': 'Font size of text that is spread out on ' \
             + 'multiple lines of a card space. Text on a single line ' \
             + 'is automatically sized to fit in the card spaces, but ' \
@@ -259,6 +384,9 @@ def main():
         default=DEFAULTS['column labels'], help=helpDict['columnLabels'])
     colLabelGrp.add_argument('--column-labels-off', action='store_true',
         help=helpDict['columnLabelsOff'])
+    parser.add_argument('--jobs', type=positive_int,
+        default=DEFAULTS['jobs'],
+        help=helpDict['jobs'])
     parser.add_argument('--multiline-font-size', type=int,
         default=DEFAULTS['multiLineFontSize'],
         help=helpDict['multiLineFontSize'])
@@ -285,41 +413,42 @@ def main():
     # If columns are not used, there is a single key of None and the
     # value is a list containing all the possible card space values.
     if args.value_file is None:
-        # Space values are for a standard bingo card
-        spaceValuesDict = OrderedDict([
-            ('B', [str(x) for x in range(1, 16)]),
-            ('I', [str(x) for x in range(16, 31)]),
-            ('N', [str(x) for x in range(31, 46)]),
-            ('G', [str(x) for x in range(46, 61)]),
-            ('O', [str(x) for x in range(61, 76)])])
+        # Space values are for a standard bingo card. Copy the dict
+        # since columns may be deleted from it below. The value tuples
+        # are shared.
+        spaceValuesDict = dict(STANDARD_VALUES)
     else:
         # Space values are read from a file
-        with open(args.value_file) as fin:
-            spaceLinesList = fin.readlines()
+        with open(args.value_file, encoding='utf-8') as fin:
+            # Split only on newlines, as readlines() does. splitlines()
+            # would also split on characters such as form feeds.
+            spaceLinesList = fin.read().split('\n')
+        if not spaceLinesList[-1]:
+            # Remove the empty string after the final newline
+            del spaceLinesList[-1]
         if not spaceLinesList:
             errMsg = f'No space values were found in {args.value_file}'
             raise ValueError(errMsg)
         # Test to see if columns are included in the file data
-        useLabels = False
-        if len(spaceLinesList[0].split('::')) > 1:
-            useLabels = True
+        useLabels = '::' in spaceLinesList[0]
         if useLabels:
             # Reading labels from each line of file data
-            spaceValuesDict = OrderedDict()
-            for line in spaceLinesList:
-                lineSp = line.split('::')
-                label = lineSp[0]
-                value = lineSp[1].rstrip().replace('\\n', '\n')
-                if label not in spaceValuesDict:
-                    spaceValuesDict[label] = [value]
-                else:
-                    spaceValuesDict[label].append(value)
+            spaceValuesDict = {}
+            for iLine,line in enumerate(spaceLinesList, 1):
+                label, sep, value = line.partition('::')
+                if not sep:
+                    if not line.strip():
+                        # Skip blank lines
+                        continue
+                    errMsg = 'No column label was found on line ' \
+                        + f'{iLine} of {args.value_file}'
+                    raise ValueError(errMsg)
+                spaceValuesDict.setdefault(label, []).append(
+                    value.rstrip().replace('\\n', '\n'))
         else:
             # Not using labels
-            spaceValuesDict = {None: []}
-            for line in spaceLinesList:
-                spaceValuesDict[None].append(
-                    line.rstrip().replace('\\n', '\n'))
+            spaceValuesDict = {None: [line.rstrip().replace('\\n', '\n')
+                for line in spaceLinesList]}
 
     # Check that the number of keys in spaceValuesDict matches the
     # number of card columns.
@@ -345,7 +474,8 @@ def main():
         cardTitle=args.card_title, columnLabelList=colList,
         multiLineFontSize=args.multiline_font_size,
         nCardsPerPage=args.cards_per_page, outFile=args.card_file,
-        scatter=args.scatter, useFreeSpace=(not args.no_free))
+        scatter=args.scatter, useFreeSpace=(not args.no_free),
+        nJobs=args.jobs)
     # end of function main
 
 